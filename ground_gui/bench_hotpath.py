@@ -0,0 +1,316 @@
+"""Microbenchmark cho đường xử lý từng gói ở ground station.
+
+Đo throughput (op/s) và bộ nhớ cấp phát đỉnh (tracemalloc) của các hàm nóng
+với payload ghi lại từ sim_drone.py (bench_recorded.txt) và payload tổng hợp
+(chuẩn, nhiễu, bị cắt, rất lớn). So với bench_baseline.json và trả exit code
+1 nếu tụt quá ngưỡng.
+
+Throughput được chia cho một vòng hiệu chuẩn thuần Python (chạy xen kẽ ngay
+sau từng lần đo) để baseline dùng được giữa các máy khác nhau.
+
+    python3 bench_hotpath.py              # so với baseline
+    python3 bench_hotpath.py --update     # ghi lại baseline
+    python3 bench_hotpath.py --no-qt      # máy không có PyQt6: bỏ các case bridge/*
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+BASELINE = HERE / "bench_baseline.json"
+RECORDED = HERE / "bench_recorded.txt"
+
+sys.path.insert(0, str(HERE))
+from control import (GroundController, _as_true, _clean_json_str, _is_num,  # noqa: E402
+                     _parse_battery, _parse_speed)
+from roles import decide_role  # noqa: E402
+
+
+# ------------- payload -------------
+def _well_formed(rng, n=200):
+    out = []
+    for i in range(n):
+        kind = i % 6
+        if kind == 0:
+            d = {"x": rng.uniform(-50, 50), "y": rng.uniform(-50, 50), "z": rng.uniform(0, 20)}
+        elif kind == 1:
+            d = {"lat": 11.05 + rng.random() * 1e-3, "lon": 106.66 + rng.random() * 1e-3, "alt": 12.5}
+        elif kind == 2:
+            d = {"battery": {"percent": rng.random(), "voltage": 15 + rng.random()}}
+        elif kind == 3:
+            d = rng.choice([{"percent": 87}, {"battery": 0.5, "volt": 15.2}, {"voltage": 15.1}])
+        elif kind == 4:
+            d = rng.choice([{"speed": rng.random() * 5}, {"vel": rng.random() * 5, "hb": "true"}])
+        else:
+            d = {"event": "mode_push", "status": True, "mode": "OFFBOARD", "msg": "ok", "hb": 1}
+        out.append(json.dumps(d))
+    return out
+
+
+def _noisy(rng, lines):
+    junk = ["\x00\xff", "LORA RSSI -87 ", ">>", "��", "+RCV=1,42,"]
+    return [rng.choice(junk) + l + rng.choice(["", " #a7", "�", " OK"]) for l in lines]
+
+
+def _truncated(rng, lines):
+    return [l[:rng.randrange(1, max(2, len(l) - 1))] for l in lines]
+
+
+def _huge(rng, n=4):
+    out = []
+    for _ in range(n):
+        wps = [{"lat": 11.05 + rng.random() * 1e-3, "lon": 106.66 + rng.random() * 1e-3, "alt": 10.0}
+               for _ in range(150)]
+        out.append(json.dumps({"coord": "gps", "waypoints": wps, "x": 1.0, "y": 2.0, "z": 3.0, "hb": 1}))
+    return out
+
+
+def corpora():
+    rng = random.Random(42)
+    wf = _well_formed(rng)
+    sets = {
+        "well": wf,
+        "noisy": _noisy(rng, wf),
+        "trunc": _truncated(rng, wf),
+        "huge": _huge(rng),
+    }
+    if RECORDED.exists():
+        sets["recorded"] = [l for l in RECORDED.read_text(encoding="utf-8").splitlines() if l.strip()]
+    return sets
+
+
+# ------------- cases -------------
+class _NullBridge:
+    def update_position(self, x, y, z): pass
+    def update_global_position(self, lat, lon, alt): pass
+    def update_battery(self, p, v): pass
+    def update_speed(self, s): pass
+    def update_link(self, ok): pass
+    def mode_push(self, ok, mode, msg): pass
+
+
+def _json_or_none(s):
+    try:
+        return json.loads(s)
+    except json.JSONDecodeError:
+        return None
+
+
+def core_cases(sets):
+    cases = {}
+    for name, lines in sets.items():
+        cleaned = [c for c in map(_clean_json_str, lines) if c]
+        cases[f"clean_json_str/{name}"] = (_clean_json_str, lines)
+        if cleaned:
+            cases[f"json_loads/{name}"] = (_json_or_none, cleaned)
+
+    dicts = [d for d in map(_json_or_none, [c for c in map(_clean_json_str, sets["well"]) if c]) if isinstance(d, dict)]
+    values = [1, 2.5, float("nan"), float("inf"), "3", None, True, -0.0, 10 ** 20, [1]]
+    flags = [1, 0, "true", "Yes", " n ", True, None, 1.0, "1", 2]
+    cases["is_num"] = (_is_num, values)
+    cases["as_true"] = (_as_true, flags)
+    cases["parse_battery"] = (_parse_battery, dicts)
+    cases["parse_speed"] = (_parse_speed, dicts)
+
+    roles = {"admin": {"boss@eiu.edu.vn"}, "operator": {"op@eiu.edu.vn"},
+             "domain_defaults": {"gmail.com": "operator"}, "default_role": "viewer"}
+    emails = ["boss@eiu.edu.vn", "op@eiu.edu.vn", "a@gmail.com", "x@other.org", "", "noat"]
+    cases["decide_role"] = (lambda e: decide_role(roles, e), emails)
+
+    ctl = GroundController(port="/dev/null", gui_bridge=_NullBridge())
+    ctl._rx_seq.seen = lambda seq: False      # không lọc trùng khi lặp lại corpus
+    for name in ("well", "noisy", "huge") + (("recorded",) if "recorded" in sets else ()):
+        cases[f"handle_line/{name}"] = (ctl._handle_line, [l.encode("utf-8") for l in sets[name]])
+    return cases
+
+
+def bridge_cases():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtCore import QCoreApplication
+        from lora_bridge import LoraBridge
+    except ImportError as e:
+        print(f"[BENCH] bỏ qua LoraBridge (không có Qt thì chạy --no-qt): {e}")
+        return {}
+    app = QCoreApplication.instance() or QCoreApplication([])
+    with contextlib.redirect_stdout(io.StringIO()):
+        b = LoraBridge()
+    b._app = app
+    return {
+        "bridge/update_position": (lambda a: b.update_position(*a), [(1.0, 2.0, 3.0)] * 10),
+        "bridge/update_global_position": (lambda a: b.update_global_position(*a), [(11.05, 106.66, 3.5)] * 10),
+        "bridge/update_battery": (lambda a: b.update_battery(*a), [(87.0, 15.7)] * 10),
+        "bridge/update_speed": (b.update_speed, [1.2] * 10),
+    }
+
+
+# ------------- đo -------------
+def _spin(n):
+    acc = 0
+    for i in range(n):
+        acc += i & 7
+    return acc
+
+
+def calibrate(n=50000, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        _spin(n)
+        best = min(best, time.perf_counter() - t0)
+    return n / best
+
+
+def _median(xs):
+    xs = sorted(xs)
+    return xs[len(xs) // 2]
+
+
+def measure(fn, inputs, min_time=0.2, repeat=9):
+    """Trả (score, op/s, calib, peak_bytes).
+
+    Mỗi lần lặp chạy case rồi chạy ngay vòng hiệu chuẩn cùng thời lượng; score
+    là trung vị của tỉ số hai tốc độ nên nhiễu máy (xung nhịp, CPU bị chia)
+    tác động lên cả tử và mẫu, không lệch kết quả như khi đo tách rời.
+    """
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        loops = 1
+        while True:
+            t0 = time.perf_counter()
+            for _ in range(loops):
+                for x in inputs:
+                    fn(x)
+            dt = time.perf_counter() - t0
+            if dt >= min_time / repeat:
+                break
+            loops *= 2
+        spin_n = max(1000, int(calibrate() * dt))
+
+        ratios, ops, calibs = [], [], []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in range(loops):
+                for x in inputs:
+                    fn(x)
+            t1 = time.perf_counter()
+            _spin(spin_n)
+            t2 = time.perf_counter()
+            o, c = loops * len(inputs) / (t1 - t0), spin_n / (t2 - t1)
+            ratios.append(o / c); ops.append(o); calibs.append(c)
+            sink.seek(0); sink.truncate()
+
+        tracemalloc.start()
+        for x in inputs:
+            fn(x)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return _median(ratios), _median(ops), _median(calibs), peak
+
+
+def run(args):
+    cases = core_cases(corpora())
+    if not args.no_qt:
+        cases.update(bridge_cases())
+    # làm nóng CPU (tần số xung) trước khi hiệu chuẩn
+    t_end = time.perf_counter() + 0.5
+    while time.perf_counter() < t_end:
+        _spin(10000)
+
+    base = {}
+    if BASELINE.exists() and not args.update:
+        base = json.loads(BASELINE.read_text(encoding="utf-8")).get("cases", {})
+
+    results = {}
+    calibs = []
+
+    def once(fn, inputs):
+        score, ops, calib, peak = measure(fn, inputs, min_time=args.min_time)
+        calibs.append(calib)
+        return {"score": score, "ops": ops, "peak_bytes": peak}
+
+    for name, (fn, inputs) in cases.items():
+        if args.update:
+            # baseline = trung vị nhiều vòng, không phải 1 lần đo may/rủi
+            runs = sorted((once(fn, inputs) for _ in range(args.rounds)), key=lambda r: r["score"])
+            r = dict(runs[len(runs) // 2])
+            r["peak_bytes"] = max(x["peak_bytes"] for x in runs)
+            results[name] = r
+            continue
+        b = base.get(name)
+        for _ in range(1 + args.retries):
+            r = once(fn, inputs)
+            if name not in results or r["score"] > results[name]["score"]:
+                results[name] = r
+            # đo lại chỉ khi có vẻ tụt (máy ồn); regression thật vẫn tụt sau khi đo lại
+            if not b or results[name]["score"] >= b["score"] * (1 - args.tolerance):
+                break
+    calib = _median(calibs)
+
+    failed = []
+    print(f"{'case':34} {'op/s':>12} {'score':>9} {'Δscore':>8} {'peak KB':>8} {'Δpeak':>7}")
+    for name, r in results.items():
+        b = base.get(name)
+        d_score = d_peak = ""
+        if b:
+            ds = r["score"] / b["score"] - 1.0
+            dp = (r["peak_bytes"] - b["peak_bytes"]) / max(b["peak_bytes"], 1)
+            d_score, d_peak = f"{ds:+.0%}", f"{dp:+.0%}"
+            slow = ds < -args.tolerance
+            fat = r["peak_bytes"] > b["peak_bytes"] * (1 + args.mem_tolerance) + args.mem_slack
+            if slow or fat:
+                failed.append(name)
+                d_score += " !" if slow else ""
+                d_peak += " !" if fat else ""
+        elif base:
+            d_score = "mới !"
+        print(f"{name:34} {r['ops']:12.0f} {r['score']:9.4f} {d_score:>8} {r['peak_bytes'] / 1024:8.1f} {d_peak:>7}")
+
+    if args.update:
+        BASELINE.write_text(json.dumps({
+            "python": sys.version.split()[0],
+            "calibration_ops": calib,
+            "cases": {k: {"score": round(v["score"], 5), "peak_bytes": v["peak_bytes"]} for k, v in results.items()},
+        }, indent=2) + "\n", encoding="utf-8")
+        print(f"[BENCH] đã ghi baseline -> {BASELINE.name}")
+        return 0
+    if not base:
+        print(f"❌ [BENCH] không có baseline ({BASELINE.name}); chạy --update")
+        return 1
+    # case chưa có baseline hoặc có baseline mà không đo được đều không được qua âm thầm
+    new = [k for k in results if k not in base]
+    missing = [k for k in base if k not in results and not (args.no_qt and k.startswith("bridge/"))]
+    if new:
+        print(f"❌ [BENCH] {len(new)} case chưa có baseline (chạy --update): {', '.join(new)}")
+    if missing:
+        print(f"❌ [BENCH] {len(missing)} case có baseline nhưng không đo được: {', '.join(missing)}")
+    if failed:
+        print(f"❌ [BENCH] {len(failed)} case tụt quá ngưỡng: {', '.join(failed)}")
+    if new or missing or failed:
+        return 1
+    print("✅ [BENCH] không có regression")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark đường xử lý gói của ground station")
+    ap.add_argument("--update", action="store_true", help="ghi kết quả hiện tại làm baseline")
+    ap.add_argument("--tolerance", type=float, default=0.30, help="mức tụt throughput cho phép (0.30 = 30%%)")
+    ap.add_argument("--mem-tolerance", type=float, default=0.25, help="mức tăng bộ nhớ đỉnh cho phép")
+    ap.add_argument("--mem-slack", type=int, default=2048, help="byte cộng thêm vào ngưỡng bộ nhớ")
+    ap.add_argument("--min-time", type=float, default=0.5, help="thời gian đo tối thiểu mỗi case (s)")
+    ap.add_argument("--retries", type=int, default=2, help="số lần đo lại case có vẻ tụt")
+    ap.add_argument("--rounds", type=int, default=5, help="số vòng đo mỗi case khi --update (lấy trung vị)")
+    ap.add_argument("--no-qt", action="store_true", help="bỏ qua các case LoraBridge")
+    sys.exit(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""So sánh độ trễ serial -> UI giữa chế độ in-process và process I/O riêng.
+
+Một process "drone" riêng (không chịu tải GUI) ghi frame vào pty ở 20 Hz;
+giá trị "speed" mang thời điểm ghi (time.monotonic, dùng chung giữa các
+process trên Linux) nên bridge tính được độ trễ khi nhận. Tải GUI giả lập là các lời gọi C giữ GIL lâu (json.dumps một
+object lớn, giống cập nhật DOM/serialize lớn) lặp theo chu kỳ.
+
+    python3 bench_ioproc.py --seconds 15 --load-ms 40
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import time
+import tty
+
+from io_process import IOProcessController
+
+
+class _LatencyBridge:
+    def __init__(self):
+        self.ui = []
+        self.decode = []
+
+    def update_speed(self, spd):
+        self.ui.append(time.monotonic() - spd)
+
+    def update_position(self, x, y, z): pass
+    def update_global_position(self, lat, lon, alt): pass
+    def update_battery(self, p, v): pass
+    def update_link(self, ok): pass
+    def mode_push(self, ok, mode, msg): pass
+
+
+class _TimedIOProcess(IOProcessController):
+    def _dispatch(self, rec):
+        if self.gui_bridge and rec[1] == 4:         # SPEED: t ghi ring - t gửi
+            self.gui_bridge.decode.append(rec[2] - rec[3])
+        super()._dispatch(rec)
+
+
+def _drone(name_q, go, seconds, hz):
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(master, False)
+    name_q.put(os.ttyname(slave))
+    go.wait()
+    period = 1.0 / hz
+    t_end = time.monotonic() + seconds
+    k = 0
+    while time.monotonic() < t_end:
+        k += 1
+        os.write(master, json.dumps({"x": k * 0.01, "y": 1.0, "z": 3.5}).encode() + b"\n")
+        os.write(master, json.dumps({"speed": time.monotonic(), "hb": 1}).encode() + b"\n")
+        try:
+            os.read(master, 1024)            # xả lệnh ON/rate từ ground
+        except BlockingIOError:
+            pass
+        time.sleep(period)
+    time.sleep(1.0)                          # giữ pty mở tới khi ground đọc xong
+    os.close(master); os.close(slave)
+
+
+def _gui_load(seconds, load_ms, period_ms):
+    # kích thước object sao cho 1 lần json.dumps ~ load_ms (giữ GIL suốt lời gọi C)
+    blob = [{"k": i, "v": [i, i + 1.5, "x" * 8]} for i in range(20000)]
+    t0 = time.perf_counter(); json.dumps(blob); one = time.perf_counter() - t0
+    blob = blob * max(1, int(load_ms / 1000.0 / max(one, 1e-6)))
+    t_end = time.monotonic() + seconds
+    while time.monotonic() < t_end:
+        if load_ms > 0:
+            json.dumps(blob)
+        time.sleep(period_ms / 1000.0)
+
+
+def _pct(xs, p):
+    if not xs:
+        return float("nan")
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100.0 * len(xs)))]
+
+
+def _report(name, xs):
+    ms = [x * 1000 for x in xs]
+    print(f"{name:22} n={len(ms):4d}  p50={_pct(ms, 50):7.2f}  p95={_pct(ms, 95):7.2f}  "
+          f"p99={_pct(ms, 99):7.2f}  max={max(ms) if ms else float('nan'):7.2f} ms")
+
+
+def run_mode(mode, args):
+    ctx = mp.get_context("spawn")
+    name_q, go = ctx.Queue(), ctx.Event()
+    drone = ctx.Process(target=_drone, args=(name_q, go, args.seconds, args.hz), daemon=True)
+    drone.start()
+    port = name_q.get(timeout=10)
+    bridge = _LatencyBridge()
+
+    if mode == "inproc":
+        from control import GroundController
+        quiet = contextlib.redirect_stdout(io.StringIO())
+        quiet.__enter__()
+        ctl = GroundController(port=port, gui_bridge=bridge)
+        ctl.supervise()
+        ctl.start()
+        ctl.read_position_from_drone()
+    else:
+        ctl = _TimedIOProcess(port=port, gui_bridge=bridge, quiet=True)
+        ctl.supervise()
+        ctl.start()
+        ctl.read_position_from_drone()
+    time.sleep(1.5)                          # chờ mở cổng
+
+    go.set()
+    _gui_load(args.seconds, args.load_ms, args.period_ms)
+    time.sleep(0.5)
+    ctl.close()
+    drone.join(timeout=5)
+    if mode == "inproc":
+        quiet.__exit__(None, None, None)
+
+    _report(f"{mode} serial->UI", bridge.ui)
+    if bridge.decode:
+        _report(f"{mode} serial->ring", bridge.decode)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Độ trễ serial->UI: in-process vs process I/O")
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--hz", type=float, default=20)
+    ap.add_argument("--load-ms", type=float, default=40, help="thời gian giữ GIL mỗi lần tải GUI")
+    ap.add_argument("--period-ms", type=float, default=60, help="khoảng nghỉ giữa các lần tải")
+    ap.add_argument("--mode", choices=("inproc", "ioproc", "both"), default="both")
+    args = ap.parse_args()
+    print(f"tải GUI: {args.load_ms:.0f} ms giữ GIL / {args.period_ms:.0f} ms nghỉ, {args.hz:.0f} Hz, {args.seconds:.0f}s")
+    for mode in (("inproc", "ioproc") if args.mode == "both" else (args.mode,)):
+        run_mode(mode, args)
+
+
+if __name__ == "__main__":
+    main()
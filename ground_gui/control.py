@@ -3,6 +3,12 @@ import json
 import time
 import threading
 import math
+import os
+import sys
+
+from fec import FEC_MARK, SeqFilter, decode as fec_decode, encode_line as fec_encode_line, seq_key
+from link_supervisor import LinkSupervisor, find_port
+from rate_control import RateController
 
 def _is_num(x):
     try:
@@ -22,11 +28,45 @@ def _as_true(v):
     if isinstance(v, str): return v.strip().lower() in ("1", "true", "t", "yes", "y")
     return False
 
+def _parse_battery(data):
+    """Chuẩn hoá pin -> (percent 0..100 | None, voltage | None)."""
+    percent = None; voltage = None
+    if "battery" in data and isinstance(data["battery"], dict):
+        b = data["battery"]
+        if "percent" in b and _is_num(b["percent"]):
+            pv = float(b["percent"])
+            percent = pv * 100.0 if pv <= 1.0 else pv
+        if "voltage" in b and _is_num(b["voltage"]):
+            voltage = float(b["voltage"])
+    if percent is None and "percent" in data and _is_num(data["percent"]):
+        pv = float(data["percent"])
+        percent = pv * 100.0 if pv <= 1.0 else pv
+    if percent is None and "battery" in data and _is_num(data["battery"]):
+        pv = float(data["battery"])
+        percent = pv * 100.0 if pv <= 1.0 else pv
+    if voltage is None and "voltage" in data and _is_num(data["voltage"]):
+        voltage = float(data["voltage"])
+    if voltage is None and "volt" in data and _is_num(data["volt"]):
+        voltage = float(data["volt"])
+    return percent, voltage
+
+def _parse_speed(data):
+    if "speed" in data and _is_num(data["speed"]):
+        return float(data["speed"])
+    if "vel" in data and _is_num(data["vel"]):
+        return float(data["vel"])
+    return None
+
 class GroundController:
-    def __init__(self, port='/dev/lora_ground', baudrate=9600, gui_bridge=None):
+    def __init__(self, port='/dev/lora_ground', baudrate=9600, gui_bridge=None,
+                 usb_vid=None, usb_pid=None, usb_serial=None, fec=False):
         self.port = port
         self.baudrate = baudrate
+        self.usb_vid = usb_vid
+        self.usb_pid = usb_pid
+        self.usb_serial = usb_serial
         self.ser = None
+        self._tx_lock = threading.Lock()  # GUI, retry, rate, supervisor cùng ghi serial
         self.waypoints = []
         self.received_thread = None
         self.received = False
@@ -40,35 +80,111 @@ class GroundController:
         self._last_ack_mode = None
         self._last_ack_at = 0.0 
 
+        # rate control telemetry
+        self.rate_ctl = RateController(baudrate)
+        self._rate_thread = None
+        self._rx_bytes = 0
+        self._ack_rtt = None             # giây, ACK gần nhất
+
+        # supervisor tự mở lại cổng khi radio bị rút/cắm lại
+        self.supervisor = LinkSupervisor(self)
+        self._port_up = threading.Event()
+        self._serial_error = False
+        self._want_on = False            # đã START -> gửi lại ON sau khi reconnect
+
+        # FEC + chống trùng lệnh theo seq
+        self.fec = fec
+        if fec:
+            self.rate_ctl.frame_scale = 2.1
+        self._sid = os.urandom(4).hex()  # nonce phiên: seq của controller mới không trùng phiên cũ
+        self._tx_seq = 0
+        self._rx_seq = SeqFilter()
+        self.fec_ok = 0
+        self.fec_fail = 0
+
     # ------------- Serial -------------
     def connect(self):
         if self.ser is None or not self.ser.is_open:
             try:
-                self.ser = serial.Serial(self.port, self.baudrate, timeout=0.2)
+                port = find_port(self.port, self.usb_vid, self.usb_pid, self.usb_serial) or self.port
+                self.ser = serial.Serial(port, self.baudrate, timeout=0.2)
                 self.ser.reset_input_buffer()
                 self.ser.reset_output_buffer()
                 time.sleep(0.2)
-                print(f"✅ Đã kết nối LoRa tại {self.port} @ {self.baudrate}")
+                self._serial_error = False
+                self._port_up.set()
+                print(f"✅ Đã kết nối LoRa tại {port} @ {self.baudrate}")
             except Exception as e:
                 print(f"❌ Không thể kết nối: {e}")
                 self.ser = None
 
+    def supervise(self):
+        """Giao việc mở/mở lại cổng cho LinkSupervisor (chạy nền, không chặn GUI)."""
+        self.supervisor.start()
+
+    def _on_port_up(self, ser):
+        self.ser = ser
+        self._serial_error = False
+        self.rate_ctl.rates = {}         # gửi lại rate cho phiên mới
+        self._port_up.set()
+        if self._want_on:
+            self._send_on()
+
+    def _on_port_down(self):
+        self._port_up.clear()
+        ser, self.ser = self.ser, None
+        if ser:
+            try: ser.close()
+            except Exception: pass
+        if self._link_ok:
+            self._link_ok = False
+            self._emit_link(False)
+
+    def _write_frame(self, line: bytes):
+        """Ghi 1 frame JSON ra serial, mã hoá FEC nếu bật.
+
+        Mọi lần ghi đi qua đây và giữ _tx_lock tới hết flush: write() của
+        pyserial có thể ghi nhiều lần từng phần, frame khác chen vào sẽ hỏng cả hai.
+        """
+        if self.fec:
+            line = fec_encode_line(line)
+        with self._tx_lock:
+            self.ser.write(line)
+            self.ser.flush()
+
+    def _cmd_bytes(self, cmd: str) -> bytes:
+        # (sid, cmd, seq) cố định cho mọi lần retry -> drone bỏ qua lệnh trùng
+        self._tx_seq = (self._tx_seq + 1) & 0xFFFF
+        return json.dumps({"cmd": cmd, "sid": self._sid, "seq": self._tx_seq},
+                          separators=(",", ":")).encode('utf-8') + b"\n"
+
+    def _send_on(self):
+        try:
+            print("[INFO] Gửi lệnh ON tới LoRa")
+            self._write_frame(b'ON\n')
+        except Exception as e:
+            print(f"❌[ERROR] Lỗi gửi lệnh ON: {e}")
+
     def start(self):
-        self.connect()
+        self._want_on = True
+        self._rx_seq = SeqFilter()
+        if not self.supervisor.running:
+            self.connect()
         if self.ser and self.ser.is_open:
-            try:
-                print("[INFO] Gửi lệnh ON tới LoRa")
-                self.ser.write(b'ON\n')
-                self.ser.flush()
-            except Exception as e:
-                print(f"❌[ERROR] Lỗi gửi lệnh ON: {e}")
+            self._send_on()
+        elif self.supervisor.running:
+            print("[INFO] Serial chưa mở — sẽ gửi ON khi supervisor kết nối lại.")
         else:
             print("[ERROR] Serial không mở.")
 
     def stop(self):
        
+        self._want_on = False
         self.received = False
         self._last_hb = 0.0
+        self.rate_ctl.set_phase("idle")
+        self.rate_ctl.rates = {}
+        self._ack_rtt = None
         if self._link_ok:
             self._link_ok = False
             self._emit_link(False)
@@ -76,17 +192,27 @@ class GroundController:
         if self.ser and self.ser.is_open:
             try:
                 print("[INFO] Gửi lệnh OFF tới LoRa")
-                self.ser.write(b'OFF\n')
-                self.ser.flush()
+                self._write_frame(b'OFF\n')
             except Exception as e:
                 print(f"⚠️ Không gửi được OFF: {e}")
+            if not self.supervisor.running:
+                self._close_port()
+        else:
+            print("[INFO] Serial đã đóng hoặc chưa mở.")
+
+    def close(self):
+        self.supervisor.stop()
+        self.stop()
+        self._close_port()
+
+    def _close_port(self):
+        self._port_up.clear()
+        if self.ser and self.ser.is_open:
             try:
                 self.ser.close()
                 print("[INFO] Đã đóng serial")
             except Exception as e:
                 print(f"⚠️ Lỗi khi đóng serial: {e}")
-        else:
-            print("[INFO] Serial đã đóng hoặc chưa mở.")
 
     def set_gui_bridge(self, bridge):
         self.gui_bridge = bridge
@@ -116,9 +242,138 @@ class GroundController:
                     self._emit_link(True)
             time.sleep(interval)
 
+    # ------------- Rate control -------------
+    def set_ui_visible(self, visible: bool):
+        self.rate_ctl.set_ui_visible(visible)
+
+    def set_mission_phase(self, phase: str):
+        self.rate_ctl.set_phase(phase)
+
+    def _send_rate_request(self, rates):
+        if not self.ser or not self.ser.is_open:
+            return False
+        try:
+            payload = json.dumps({"cmd": "rate", **rates}, separators=(",", ":"))
+            self._write_frame((payload + "\n").encode('utf-8'))
+            print(f"[RATE] {payload}")
+            return True
+        except Exception as e:
+            print(f"⚠️ Không gửi được rate: {e}")
+            return False
+
+    def _rate_watch(self, interval=2.0):
+        last_bytes = self._rx_bytes
+        last_t = time.monotonic()
+        while self.received:
+            time.sleep(interval)
+            now = time.monotonic()
+            bps = (self._rx_bytes - last_bytes) / max(now - last_t, 1e-3)
+            last_bytes, last_t = self._rx_bytes, now
+            # mỗi ACK chỉ được tính cho 1 lần update, không kéo scale xuống mãi
+            rtt, self._ack_rtt = self._ack_rtt, None
+            rates = self.rate_ctl.update(bps, rtt)
+            if self.rate_ctl.should_send(rates, now) and self._send_rate_request(rates):
+                self.rate_ctl.mark_sent(rates, now)
+
     # ------------- RX loop -------------
+    def _handle_line(self, raw: bytes):
+        """Xử lý 1 dòng nhận từ serial (đã tách '\n')."""
+        if raw[:1] == FEC_MARK:
+            dec = fec_decode(raw[1:])
+            if dec is None:
+                self.fec_fail += 1
+                print(f"⚠️ FEC không sửa được gói ({len(raw)} B)")
+                return
+            self.fec_ok += 1
+            raw = dec
+
+        line = raw.decode('utf-8', errors='replace').strip()
+        if not line:
+            return
+
+        clean_line = _clean_json_str(line)
+        if not clean_line:
+            print(f"⚠️ Bỏ qua gói không hợp lệ: {line}")
+            return
+
+        print(f"[RAW] {clean_line}")
+        try:
+            data = json.loads(clean_line)
+        except json.JSONDecodeError:
+            print(f"⚠️ Không decode được JSON: {clean_line}")
+            return
+
+        now = time.monotonic()
+        self._last_seen = now
+
+        key = seq_key(data)
+        if key is not None and self._rx_seq.seen(key):
+            print(f"[INFO] Bỏ gói trùng seq={key[-1]}")
+            return
+
+        if data.get("event") == "mode_push":
+            ok   = bool(data.get("status", False))
+            mode = str(data.get("mode", "")).upper()
+            msg  = str(data.get("msg", ""))
+            self._last_ack_mode = mode
+            self._last_ack_at   = now
+            if ok and mode == "OFFBOARD":
+                self.rate_ctl.set_phase("mission")
+            elif ok and mode == "LAND":
+                self.rate_ctl.set_phase("landing")
+            if self.gui_bridge:
+                try:
+                    if hasattr(self.gui_bridge, "mode_push"):
+                        self.gui_bridge.mode_push(ok, mode, msg)
+                    elif hasattr(self.gui_bridge, "modePush"):
+                        self.gui_bridge.modePush(ok, mode, msg)
+                except Exception as e:
+                    print(f"GUI bridge error (mode_push): {e}")
+
+        if _as_true(data.get("hb", 0)):
+            self._last_hb = now
+            if not self._link_ok:
+                self._link_ok = True
+                self._emit_link(True)
+
+        if all(k in data for k in ("x","y","z")) and _is_num(data["x"]) and _is_num(data["y"]) and _is_num(data["z"]):
+            x, y, z = float(data["x"]), float(data["y"]), float(data["z"])
+            print(f"📥 Local position: x={x}, y={y}, z={z}")
+            if self.rate_ctl.phase == "landing" and abs(z) < self.rate_ctl.landed_alt:
+                self.rate_ctl.set_phase("idle")      # đã chạm đất
+            if self.gui_bridge and hasattr(self.gui_bridge, "update_position"):
+                try: self.gui_bridge.update_position(x, y, z)
+                except Exception as e: print(f"⚠️ GUI bridge error (pos): {e}")
+
+        if all(k in data for k in ("lat","lon","alt")) and _is_num(data["lat"]) and _is_num(data["lon"]) and _is_num(data["alt"]):
+            lat, lon, alt = float(data["lat"]), float(data["lon"]), float(data["alt"])
+            print(f"📥 Global position: lat={lat}, lon={lon}, alt={alt}")
+            if self.gui_bridge and hasattr(self.gui_bridge, "update_global_position"):
+                try: self.gui_bridge.update_global_position(lat, lon, alt)
+                except Exception as e: print(f"⚠️ GUI bridge error (gps): {e}")
+        # ---- Battery ----
+        try:
+            percent, voltage = _parse_battery(data)
+            if self.gui_bridge and (percent is not None or voltage is not None) and hasattr(self.gui_bridge, "update_battery"):
+                try:
+                    p = float(percent) if percent is not None else -1.0
+                    v = float(voltage) if voltage is not None else float("nan")
+                    self.gui_bridge.update_battery(p, v)
+                except Exception as e:
+                    print(f"⚠️ GUI bridge error (battery): {e}")
+        except Exception as e:
+            print(f"⚠️ Battery parse error: {e}")
+
+        # ---- Speed ----
+        try:
+            spd = _parse_speed(data)
+            if spd is not None and self.gui_bridge and hasattr(self.gui_bridge, "update_speed"):
+                self.gui_bridge.update_speed(spd)
+        except Exception as e:
+            print(f"⚠️ GUI bridge error (speed): {e}")
+
     def read_position_from_drone(self):
-        if not self.ser or not self.ser.is_open:
+        if (not self.ser or not self.ser.is_open) and not self.supervisor.running:
             print("⚠️ Chưa kết nối serial.")
             return
 
@@ -131,129 +386,58 @@ class GroundController:
                 daemon=True
             )
             self._hb_thread.start()
+        if not self._rate_thread or not self._rate_thread.is_alive():
+            self._rate_thread = threading.Thread(target=self._rate_watch, daemon=True)
+            self._rate_thread.start()
         def _read_loop():
             print("📡 Bắt đầu nhận vị trí từ drone...")
-            buffer = ""
+            buffer = b""
+            last_ser = None
             while self.received:
+                ser = self.ser
+                if not ser or not ser.is_open:
+                    # chờ supervisor mở lại cổng
+                    self._port_up.wait(0.5)
+                    continue
+                if ser is not last_ser:
+                    buffer, last_ser = b"", ser
                 try:
-                    chunk = self.ser.read(256)
-                    if not chunk:
-                        continue
-
-                    # Ghép buffer
-                    buffer += chunk.decode('utf-8', errors='replace')
-
-                    # CHUẨN HOÁ line ending: CRLF/CR -> LF
-                    if "\r" in buffer:
-                        buffer = buffer.replace("\r\n", "\n").replace("\r", "\n")
-
-                    # TÁCH DÒNG AN TOÀN
-                    while True:
-                        nl = buffer.find("\n")
-                        if nl == -1:
-                            break
-                        line = buffer[:nl]
-                        buffer = buffer[nl+1:]
-
-                        line = line.strip()
-                        if not line:
-                            continue
-
-                        clean_line = _clean_json_str(line)
-                        if not clean_line:
-                            print(f"⚠️ Bỏ qua gói không hợp lệ: {line}")
-                            continue
-
-                        print(f"[RAW] {clean_line}")
-                        try:
-                            data = json.loads(clean_line)
-                        except json.JSONDecodeError:
-                            print(f"⚠️ Không decode được JSON: {clean_line}")
-                            continue
-
-                        now = time.monotonic()
-                        self._last_seen = now
-
-                        if data.get("event") == "mode_push":
-                            ok   = bool(data.get("status", False))
-                            mode = str(data.get("mode", "")).upper()
-                            msg  = str(data.get("msg", ""))
-                            self._last_ack_mode = mode
-                            self._last_ack_at   = now
-                            if self.gui_bridge:
-                                try:
-                                    if hasattr(self.gui_bridge, "mode_push"):
-                                        self.gui_bridge.mode_push(ok, mode, msg)
-                                    elif hasattr(self.gui_bridge, "modePush"):
-                                        self.gui_bridge.modePush(ok, mode, msg)
-                                except Exception as e:
-                                    print(f"GUI bridge error (mode_push): {e}")
-
-                        if _as_true(data.get("hb", 0)):
-                            self._last_hb = now
-                            if not self._link_ok:
-                                self._link_ok = True
-                                self._emit_link(True)
-
-                        if all(k in data for k in ("x","y","z")) and _is_num(data["x"]) and _is_num(data["y"]) and _is_num(data["z"]):
-                            x, y, z = float(data["x"]), float(data["y"]), float(data["z"])
-                            print(f"📥 Local position: x={x}, y={y}, z={z}")
-                            if self.gui_bridge and hasattr(self.gui_bridge, "update_position"):
-                                try: self.gui_bridge.update_position(x, y, z)
-                                except Exception as e: print(f"⚠️ GUI bridge error (pos): {e}")
-
-                        if all(k in data for k in ("lat","lon","alt")) and _is_num(data["lat"]) and _is_num(data["lon"]) and _is_num(data["alt"]):
-                            lat, lon, alt = float(data["lat"]), float(data["lon"]), float(data["alt"])
-                            print(f"📥 Global position: lat={lat}, lon={lon}, alt={alt}")
-                            if self.gui_bridge and hasattr(self.gui_bridge, "update_global_position"):
-                                try: self.gui_bridge.update_global_position(lat, lon, alt)
-                                except Exception as e: print(f"⚠️ GUI bridge error (gps): {e}")
-                        # ---- Battery ----
-                        try:
-                            percent = None; voltage = None
-                            if "battery" in data and isinstance(data["battery"], dict):
-                                b = data["battery"]
-                                if "percent" in b and _is_num(b["percent"]):
-                                    pv = float(b["percent"])
-                                    percent = pv * 100.0 if pv <= 1.0 else pv
-                                if "voltage" in b and _is_num(b["voltage"]):
-                                    voltage = float(b["voltage"])
-                            if percent is None and "percent" in data and _is_num(data["percent"]):
-                                pv = float(data["percent"])
-                                percent = pv * 100.0 if pv <= 1.0 else pv
-                            if percent is None and "battery" in data and _is_num(data["battery"]):
-                                pv = float(data["battery"])
-                                percent = pv * 100.0 if pv <= 1.0 else pv
-                            if voltage is None and "voltage" in data and _is_num(data["voltage"]):
-                                voltage = float(data["voltage"])
-                            if voltage is None and "volt" in data and _is_num(data["volt"]):
-                                voltage = float(data["volt"])
-
-                            if self.gui_bridge and (percent is not None or voltage is not None) and hasattr(self.gui_bridge, "update_battery"):
-                                try:
-                                    p = float(percent) if percent is not None else -1.0
-                                    v = float(voltage) if voltage is not None else float("nan")
-                                    self.gui_bridge.update_battery(p, v)
-                                except Exception as e:
-                                    print(f"⚠️ GUI bridge error (battery): {e}")
-                        except Exception as e:
-                            print(f"⚠️ Battery parse error: {e}")
-
-                        # ---- Speed ----
-                        try:
-                            spd = None
-                            if "speed" in data and _is_num(data["speed"]):
-                                spd = float(data["speed"])
-                            elif "vel" in data and _is_num(data["vel"]):
-                                spd = float(data["vel"])
-                            if spd is not None and self.gui_bridge and hasattr(self.gui_bridge, "update_speed"):
-                                self.gui_bridge.update_speed(spd)
-                        except Exception as e:
-                            print(f"⚠️ GUI bridge error (speed): {e}")
-
+                    # đọc ngay những gì đã có (read(256) sẽ chờ đủ 256 B hoặc hết timeout)
+                    chunk = ser.read(min(max(1, ser.in_waiting), 4096))
                 except Exception as e:
+                    if not self.received:
+                        break            # stop()/close() đóng cổng khi đang đọc
+                    if ser is not self.ser:
+                        continue         # supervisor đã đóng handle cũ
                     print(f"❌ Lỗi đọc serial: {e}")
+                    self._serial_error = True
+                    self.supervisor.kick()
                     time.sleep(0.5)
+                    continue
+                if not chunk:
+                    continue
+                self._rx_bytes += len(chunk)
+
+                # Ghép buffer (bytes: frame FEC có byte >= 0x80)
+                buffer += chunk
+
+                # CHUẨN HOÁ line ending: CRLF/CR -> LF
+                if b"\r" in buffer:
+                    buffer = buffer.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+                # TÁCH DÒNG AN TOÀN
+                while True:
+                    nl = buffer.find(b"\n")
+                    if nl == -1:
+                        break
+                    raw = buffer[:nl]
+                    buffer = buffer[nl+1:]
+
+                    # lỗi xử lý 1 gói chỉ bỏ gói đó, không phải lỗi cổng serial
+                    try:
+                        self._handle_line(raw)
+                    except Exception as e:
+                        print(f"⚠️ Lỗi xử lý gói, bỏ qua: {e}")
 
         self.received_thread = threading.Thread(target=_read_loop, daemon=True)
         self.received_thread.start()
@@ -316,21 +500,20 @@ class GroundController:
                 "coord": "gps",
                 "waypoints": self.waypoints   # [{lat,lon,alt}, ...]
             })
-            self.ser.write((payload + "\n").encode('utf-8'))
-            self.ser.flush()
+            self._write_frame((payload + "\n").encode('utf-8'))
             print(f"📤 Đã gửi {len(self.waypoints)} waypoint (GPS) tới drone")
         except Exception as e:
             print(f"❌ Lỗi gửi waypoint: {e}")
 
     def offboard_req(self):
         if self.ser and self.ser.is_open:
-            self._send_with_retry(b'{"cmd":"offboard"}\n', "OFFBOARD", tries=0, interval=30)
+            self._send_with_retry(self._cmd_bytes("offboard"), "OFFBOARD", tries=0, interval=30)
         else:
             print("⚠️ Serial chưa mở.")
 
     def land_req(self):
         if self.ser and self.ser.is_open:
-            self._send_with_retry(b'{"cmd":"land"}\n', "LAND", tries=0, interval=30)
+            self._send_with_retry(self._cmd_bytes("land"), "LAND", tries=0, interval=30)
         else:
             print("⚠️ Serial chưa mở.")
 
@@ -339,10 +522,10 @@ class GroundController:
         def worker():
             for i in range(tries + 1):
                 if not self.ser or not self.ser.is_open:
-                    break
+                    if not self.supervisor.running or not self._port_up.wait(interval):
+                        break
                 try:
-                    self.ser.write(payload_bytes)
-                    self.ser.flush()
+                    self._write_frame(payload_bytes)
                     print(f"[INFO] Sent {expect_mode} (attempt {i+1}/{tries+1})")
                 except Exception as e:
                     print(f"❌ Send error: {e}")
@@ -351,6 +534,7 @@ class GroundController:
                 t0 = time.monotonic()
                 while time.monotonic() - t0 < interval:
                     if self._last_ack_mode == expect_mode and self._last_ack_at >= t0:
+                        self._ack_rtt = self._last_ack_at - t0
                         return  # đã có ACK cho lần gửi này
                     time.sleep(0.05)
 
@@ -365,7 +549,9 @@ class GroundController:
 
 
 def main():
-    controller = GroundController(port='/dev/ttyUSB1', baudrate=9600)
+    port = sys.argv[1] if len(sys.argv) > 1 else '/dev/ttyUSB1'
+    controller = GroundController(port=port, baudrate=9600, fec=os.getenv("LORA_FEC") == "1")
+    controller.supervise()
     controller.start()
     controller.read_position_from_drone()
 
@@ -374,7 +560,7 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         print("⛔ Dừng bằng Ctrl+C")
-        controller.stop()
+        controller.close()
 
 if __name__ == '__main__':
     main()
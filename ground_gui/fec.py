@@ -0,0 +1,187 @@
+"""FEC cho frame LoRa: Hamming(7,4) interleave theo khối 7 codeword + CRC-16.
+
+Frame FEC vẫn là 1 dòng: b"~" + dữ liệu mã hoá + b"\\n". Mỗi byte mã hoá luôn
+có bit 7 = 1 nên không bao giờ trùng '\\n'/'\\r' khi link sạch. Một khối 7
+codeword (3.5 byte payload) được chuyển vị thành 7 byte: lỗi cụm làm hỏng cả
+một byte chỉ làm sai 1 bit mỗi codeword -> vẫn sửa được.
+
+    python3 fec.py     # đo goodput / mất gói / CPU decode theo BER, plain vs FEC
+
+Frame FEC dài ~2.1x nên goodput chỉ còn ~1/2 khi link sạch; FEC chỉ hoà vốn
+goodput quanh BER 1e-3. Lợi ích chính ở BER thấp hơn là không có gói sai lọt
+qua (CRC) và tỉ lệ mất thấp, không phải băng thông.
+"""
+import binascii
+import random
+import time
+from collections import deque
+
+FEC_MARK = b"~"
+GROUP = 7                      # số codeword mỗi khối interleave
+
+
+def _hamming_tables():
+    enc = []
+    for n in range(16):
+        d1, d2, d3, d4 = (n >> 3) & 1, (n >> 2) & 1, (n >> 1) & 1, n & 1
+        p1 = d1 ^ d2 ^ d4
+        p2 = d1 ^ d3 ^ d4
+        p3 = d2 ^ d3 ^ d4
+        bits = (p1, p2, d1, p3, d2, d3, d4)
+        enc.append(sum(b << (6 - i) for i, b in enumerate(bits)))
+    dec = [0] * 128
+    for n, cw in enumerate(enc):
+        dec[cw] = n
+        for i in range(7):
+            dec[cw ^ (1 << i)] = n
+    # bảng bytes.translate: byte nhận -> nibble (bỏ qua bit 7)
+    dec = bytes(dec[b & 0x7F] for b in range(256))
+    # encode theo byte: 1 byte -> 2 codeword
+    enc2 = [bytes((enc[b >> 4], enc[b & 0x0F])) for b in range(256)]
+    return enc2, dec
+
+
+_ENC2, _DEC = _hamming_tables()
+# _SPREAD[b]: bit j của b đặt vào byte j -> chuyển vị khối 7x7 bằng phép dịch/OR
+_SPREAD = [sum(((b >> j) & 1) << (8 * j) for j in range(7)) for b in range(256)]
+_HIGH = int.from_bytes(b"\x80" * 7, "little")
+_ZERO_CW = _ENC2[0][:1]
+
+
+def _transpose(blk: bytes) -> int:
+    s = _SPREAD
+    return (s[blk[0]] | s[blk[1]] << 1 | s[blk[2]] << 2 | s[blk[3]] << 3
+            | s[blk[4]] << 4 | s[blk[5]] << 5 | s[blk[6]] << 6)
+
+
+def encode(payload: bytes) -> bytes:
+    """payload -> frame FEC (chưa gồm FEC_MARK và '\\n')."""
+    body = len(payload).to_bytes(2, "big") + payload
+    body += binascii.crc_hqx(body, 0xFFFF).to_bytes(2, "big")
+    cws = b"".join([_ENC2[b] for b in body])
+    cws += _ZERO_CW * (-len(cws) % GROUP)
+
+    out = bytearray()
+    for g in range(0, len(cws), GROUP):
+        out += (_transpose(cws[g:g + GROUP]) | _HIGH).to_bytes(7, "little")
+    return bytes(out)
+
+
+def decode(coded: bytes):
+    """frame FEC -> payload, hoặc None nếu không sửa được (sai CRC/độ dài)."""
+    if not coded or len(coded) % 7:
+        return None
+    cws = bytearray()
+    for g in range(0, len(coded), 7):
+        cws += _transpose(coded[g:g + 7]).to_bytes(7, "little")
+    nibbles = cws.translate(_DEC)
+    body = bytes((nibbles[i] << 4) | nibbles[i + 1] for i in range(0, len(nibbles) - 1, 2))
+    if len(body) < 4:
+        return None
+    n = int.from_bytes(body[:2], "big")
+    if n + 4 > len(body):
+        return None
+    if binascii.crc_hqx(body[:n + 2], 0xFFFF) != int.from_bytes(body[n + 2:n + 4], "big"):
+        return None
+    return body[2:n + 2]
+
+
+def encode_line(line: bytes) -> bytes:
+    """Dòng JSON (có/không '\\n') -> dòng FEC sẵn sàng ghi ra serial."""
+    return FEC_MARK + encode(line.rstrip(b"\r\n")) + b"\n"
+
+
+class SeqFilter:
+    """Bỏ frame trùng khoá (seq hoặc tuple có seq) trong cửa sổ gần nhất.
+
+    Mỗi khoá có thể lưu kèm kết quả xử lý lần đầu để phát lại cho frame trùng.
+    """
+
+    def __init__(self, window=64):
+        self._order = deque(maxlen=window)
+        self._seen = {}
+
+    def seen(self, key) -> bool:
+        if key in self._seen:
+            return True
+        self.remember(key)
+        return False
+
+    def remember(self, key, result=None):
+        if key not in self._seen:
+            if len(self._order) == self._order.maxlen:
+                self._seen.pop(self._order[0], None)
+            self._order.append(key)
+        self._seen[key] = result
+
+    def result(self, key):
+        return self._seen.get(key)
+
+
+def seq_key(data: dict, *extra):
+    """Khoá chống trùng (sid, *extra, seq) từ 1 frame JSON.
+
+    Chỉ nhận seq kiểu int và sid kiểu str/None; giá trị khác (list, dict, ...)
+    trả None -> frame không được lọc trùng thay vì làm hỏng SeqFilter.
+    """
+    seq, sid = data.get("seq"), data.get("sid")
+    if type(seq) is not int or not (sid is None or isinstance(sid, str)):
+        return None
+    return (sid, *extra, seq)
+
+
+# ------------- đo đạc -------------
+def flip_bits(data: bytes, ber: float, rng=random) -> bytes:
+    if ber <= 0:
+        return data
+    out = bytearray(data)
+    nbits = len(out) * 8
+    i = int(rng.expovariate(ber)) if ber < 1 else 0
+    while i < nbits:
+        out[i // 8] ^= 1 << (i % 8)
+        i += 1 + int(rng.expovariate(ber))
+    return bytes(out)
+
+
+def _run_mode(sample, tx, ber, frames, rng, fec):
+    ok = bad = 0
+    cpu = 0.0
+    for _ in range(frames):
+        rx = flip_bits(tx, ber, rng)
+        t0 = time.perf_counter()
+        if not fec:
+            got = rx[:-1] if rx.count(b"\n") == 1 and rx.endswith(b"\n") else None
+        else:
+            got = decode(rx[1:-1]) if rx[:1] == FEC_MARK and rx.count(b"\n") == 1 else None
+        cpu += time.perf_counter() - t0
+        if got == sample:
+            ok += 1
+        elif got is not None:
+            bad += 1
+    return ok, bad, cpu
+
+
+def _bench(frames=20000, baudrate=9600):
+    """Plain và FEC cạnh nhau theo từng BER; cột fec/plain < 1 nghĩa là FEC
+    tốn airtime nhiều hơn số gói nó cứu được."""
+    rng = random.Random(1)
+    sample = b'{"x":-3.141,"y":12.502,"z":3.5,"battery":{"percent":0.87,"voltage":15.74},"speed":1.12,"hb":1}'
+    byte_time = 10.0 / baudrate
+    plain_tx, fec_tx = sample + b"\n", encode_line(sample)
+    print(f"payload {len(sample)} B, plain {len(plain_tx)} B / fec {len(fec_tx)} B mỗi frame, "
+          f"{frames} frame/BER @ {baudrate} baud")
+    print(f"{'BER':>7} {'loss plain':>10} {'loss fec':>9} {'sai lọt plain':>13} {'sai lọt fec':>11} "
+          f"{'goodput plain':>13} {'goodput fec':>11} {'fec/plain':>9} {'decode µs':>9}")
+    for ber in (1e-5, 1e-4, 3e-4, 1e-3):
+        row = []
+        for tx, fec in ((plain_tx, False), (fec_tx, True)):
+            ok, bad, cpu = _run_mode(sample, tx, ber, frames, rng, fec)
+            goodput = ok * len(sample) / (frames * len(tx) * byte_time)
+            row.append((1 - ok / frames, bad / frames, goodput, cpu / frames * 1e6))
+        (lp, bp, gp, _), (lf, bf, gf, cf) = row
+        print(f"{ber:7.0e} {lp:10.2%} {lf:9.2%} {bp:13.2%} {bf:11.2%} "
+              f"{gp:11.1f} B/s {gf:7.1f} B/s {gf / gp if gp else float('inf'):9.2f} {cf:9.1f}")
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,295 @@
+"""Chạy GroundController trong process riêng, tách khỏi GIL của GUI.
+
+Process I/O đọc serial/parse JSON như cũ; thay vì gọi LoraBridge trực tiếp,
+nó ghi telemetry đã decode vào ring buffer bản ghi cố định trên
+multiprocessing.shared_memory (1 producer / 1 consumer, không khoá giữa hai
+process). Lệnh từ GUI (START/STOP/LAND/...) đi qua một Queue nhỏ.
+
+Thread bơm phía GUI không poll: nó chặn trên một Pipe và chỉ thức khi process
+I/O ghi byte đánh thức (tối đa 1 byte cho mỗi lần GUI chưa kịp drain).
+
+    LORA_IO_PROCESS=1 python3 main.py
+"""
+import multiprocessing as mp
+import os
+import struct
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+# ---- layout ----
+# header: head (u64, số bản ghi đã ghi), capacity (u64), record size (u64),
+#         wake (u8 @24, 1 = đã gửi byte đánh thức, consumer chưa drain)
+_HDR = struct.Struct("<QQQ")
+_WAKE = 24
+HDR_SIZE = 64
+# record: seq (u64, = index+1 khi bản ghi hợp lệ), kind (u8), t (f64, monotonic),
+#         a, b, c, d (f64), mode (16s), msg (48s)
+_SEQ = struct.Struct("<Q")
+_REC = struct.Struct("<QB7xd4d16s48s")
+REC_SIZE = 128
+
+POS, GPS, BATT, SPEED, LINK, MODE = range(1, 7)
+
+# lệnh GUI được phép gọi sang process I/O
+_COMMANDS = {
+    "start", "stop", "land_req", "offboard_req", "update_waypoints",
+    "send_waypoints_to_drone", "set_ui_visible", "set_mission_phase",
+    "read_position_from_drone",
+}
+
+
+class TelemetryRing:
+    """Ring buffer bản ghi cố định trên shared memory (SPSC, lock-free).
+
+    Producer ghi: seq=0 -> payload -> seq=i+1 -> head=i+1. Consumer đọc seq
+    trước và sau khi copy; lệch nhau nghĩa là slot đã bị ghi đè (bị vượt vòng)
+    và bản ghi đó được tính là overrun.
+    """
+
+    def __init__(self, shm, capacity=None):
+        self.shm = shm
+        self.buf = shm.buf
+        if capacity is not None:
+            _HDR.pack_into(self.buf, 0, 0, capacity, REC_SIZE)
+        _, self.capacity, _ = _HDR.unpack_from(self.buf, 0)
+        self.tail = 0
+        self.overruns = 0
+
+    @classmethod
+    def create(cls, capacity=1024):
+        shm = shared_memory.SharedMemory(create=True, size=HDR_SIZE + capacity * REC_SIZE)
+        return cls(shm, capacity)
+
+    @classmethod
+    def attach(cls, name):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13: process con (spawn) dùng chung resource_tracker với
+            # process cha, đăng ký lại cùng tên là vô hại; process cha unlink.
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm)
+
+    def _off(self, i):
+        return HDR_SIZE + (i % self.capacity) * REC_SIZE
+
+    # ---- producer ----
+    def put(self, kind, a=0.0, b=0.0, c=0.0, d=0.0, mode="", msg=""):
+        i = _SEQ.unpack_from(self.buf, 0)[0]
+        off = self._off(i)
+        _SEQ.pack_into(self.buf, off, 0)
+        _REC.pack_into(self.buf, off, 0, kind, time.monotonic(), a, b, c, d,
+                       mode.encode("utf-8")[:16], msg.encode("utf-8")[:48])
+        _SEQ.pack_into(self.buf, off, i + 1)
+        _SEQ.pack_into(self.buf, 0, i + 1)
+
+    def mark_wake(self) -> bool:
+        """Producer: True nếu cần gửi byte đánh thức (consumer đang ngủ)."""
+        if self.buf[_WAKE]:
+            return False
+        self.buf[_WAKE] = 1
+        return True
+
+    # ---- consumer ----
+    def drain(self):
+        # xoá cờ trước khi đọc head: bản ghi ghi sau đó sẽ gửi byte đánh thức mới
+        self.buf[_WAKE] = 0
+        head = _SEQ.unpack_from(self.buf, 0)[0]
+        if head - self.tail > self.capacity:
+            self.overruns += head - self.tail - self.capacity
+            self.tail = head - self.capacity
+        out = []
+        while self.tail < head:
+            i = self.tail
+            self.tail += 1
+            off = self._off(i)
+            rec = _REC.unpack_from(self.buf, off)
+            if rec[0] != i + 1 or _SEQ.unpack_from(self.buf, off)[0] != i + 1:
+                self.overruns += 1
+                continue
+            out.append(rec)
+        return out
+
+    def close(self, unlink=False):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            try: self.shm.unlink()
+            except FileNotFoundError: pass
+
+
+class RingBridge:
+    """gui_bridge phía process I/O: mỗi lời gọi update_* thành 1 bản ghi trong ring."""
+
+    def __init__(self, ring: TelemetryRing, wake=None):
+        self.ring = ring
+        self.wake = wake                   # đầu ghi Pipe đánh thức thread bơm phía GUI
+        self._lock = threading.Lock()      # nhiều thread trong process I/O -> 1 producer
+
+    def _put(self, *args, **kw):
+        with self._lock:
+            self.ring.put(*args, **kw)
+            if self.wake is not None and self.ring.mark_wake():
+                self.wake.send_bytes(b"\x01")
+
+    def update_position(self, x, y, z):
+        self._put(POS, x, y, z)
+
+    def update_global_position(self, lat, lon, alt):
+        self._put(GPS, lat, lon, alt)
+
+    def update_battery(self, percent, voltage):
+        self._put(BATT, percent, voltage)
+
+    def update_speed(self, spd):
+        self._put(SPEED, spd)
+
+    def update_link(self, ok):
+        self._put(LINK, 1.0 if ok else 0.0)
+
+    def mode_push(self, ok, mode, msg):
+        self._put(MODE, 1.0 if ok else 0.0, mode=str(mode), msg=str(msg))
+
+
+def _io_main(shm_name, cmd_q, wake, port, baudrate, ctl_kwargs, quiet):
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    from control import GroundController
+
+    ring = TelemetryRing.attach(shm_name)
+    ctl = GroundController(port=port, baudrate=baudrate, gui_bridge=RingBridge(ring, wake), **ctl_kwargs)
+    ctl.supervise()
+    try:
+        while True:
+            cmd = cmd_q.get()
+            if cmd is None:
+                break
+            name, args = cmd
+            if name not in _COMMANDS:
+                print(f"⚠️ [IO] Lệnh không hợp lệ: {name}")
+                continue
+            try:
+                getattr(ctl, name)(*args)
+            except Exception as e:
+                print(f"❌ [IO] Lỗi khi chạy {name}: {e}")
+    finally:
+        ctl.close()
+        ring.close()
+
+
+class IOProcessController:
+    """Thay thế GroundController phía GUI: chuyển lệnh sang process I/O và
+    bơm telemetry từ ring buffer vào LoraBridge."""
+
+    def __init__(self, port='/dev/lora_ground', baudrate=9600, gui_bridge=None,
+                 capacity=1024, poll=0.25, quiet=False, **ctl_kwargs):
+        self.port = port
+        self.baudrate = baudrate
+        self.gui_bridge = gui_bridge
+        self.capacity = capacity
+        self.poll = poll                        # giây; chỉ là timeout dự phòng khi chờ đánh thức
+        self.quiet = quiet
+        self.ctl_kwargs = ctl_kwargs
+        self._ctx = mp.get_context("spawn")     # không fork process đang chạy Qt
+        self._cmd = None
+        self._wake = None
+        self._proc = None
+        self.ring = None
+        self._pump_thread = None
+        self._pumping = False
+
+    # ------------- lifecycle -------------
+    def supervise(self):
+        if self._proc and self._proc.is_alive():
+            return
+        self.ring = TelemetryRing.create(self.capacity)
+        self._cmd = self._ctx.Queue()
+        self._wake, wake_w = self._ctx.Pipe(duplex=False)
+        self._proc = self._ctx.Process(
+            target=_io_main,
+            args=(self.ring.shm.name, self._cmd, wake_w, self.port, self.baudrate, self.ctl_kwargs, self.quiet),
+            daemon=True,
+        )
+        self._proc.start()
+        wake_w.close()                          # chỉ process I/O giữ đầu ghi
+        self._pumping = True
+        self._pump_thread = threading.Thread(target=self._pump, daemon=True)
+        self._pump_thread.start()
+        print(f"✅ [IO] Process I/O pid={self._proc.pid}, ring {self.capacity} x {REC_SIZE} B")
+
+    connect = supervise
+
+    def close(self):
+        if self._proc:
+            self._cmd.put(None)
+            self._proc.join(timeout=3)
+            if self._proc.is_alive():
+                self._proc.terminate()
+            self._proc = None
+        self._pumping = False
+        if self._pump_thread:
+            self._pump_thread.join(timeout=1)
+        if self._wake:
+            self._wake.close()
+            self._wake = None
+        if self.ring:
+            self.ring.close(unlink=True)
+            self.ring = None
+
+    def set_gui_bridge(self, bridge):
+        self.gui_bridge = bridge
+
+    # ------------- commands -> process I/O -------------
+    def _call(self, name, *args):
+        if not self._proc:
+            self.supervise()
+        self._cmd.put((name, args))
+
+    def start(self): self._call("start")
+    def stop(self): self._call("stop")
+    def land_req(self): self._call("land_req")
+    def offboard_req(self): self._call("offboard_req")
+    def read_position_from_drone(self): self._call("read_position_from_drone")
+    def set_ui_visible(self, visible): self._call("set_ui_visible", bool(visible))
+    def set_mission_phase(self, phase): self._call("set_mission_phase", str(phase))
+    def send_waypoints_to_drone(self): self._call("send_waypoints_to_drone")
+
+    def update_waypoints(self, new_waypoints):
+        self._call("update_waypoints", [dict(wp) for wp in new_waypoints])
+
+    # ------------- ring -> GUI -------------
+    def _dispatch(self, rec):
+        _, kind, _t, a, b, c, _d, mode, msg = rec
+        br = self.gui_bridge
+        if not br:
+            return
+        try:
+            if kind == POS:
+                br.update_position(a, b, c)
+            elif kind == GPS:
+                br.update_global_position(a, b, c)
+            elif kind == BATT:
+                br.update_battery(a, b)
+            elif kind == SPEED:
+                br.update_speed(a)
+            elif kind == LINK:
+                br.update_link(a != 0.0)
+            elif kind == MODE:
+                br.mode_push(a != 0.0, mode.rstrip(b"\0").decode("utf-8", "ignore"),
+                             msg.rstrip(b"\0").decode("utf-8", "ignore"))
+        except Exception as e:
+            print(f"⚠️ GUI bridge error (ring kind={kind}): {e}")
+
+    def _pump(self):
+        ring, wake = self.ring, self._wake
+        while self._pumping:
+            try:
+                if wake.poll(self.poll):
+                    while wake.poll():
+                        wake.recv_bytes()
+            except (EOFError, OSError):
+                time.sleep(self.poll)              # process I/O đã thoát
+            for rec in ring.drain():
+                self._dispatch(rec)
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+
+import serial
+from serial.tools import list_ports
+
+
+def _hex_id(v):
+    if v is None or isinstance(v, int):
+        return v
+    return int(str(v), 16)
+
+
+def find_port(default=None, vid=None, pid=None, serial_number=None):
+    """Tìm radio theo USB VID/PID/serial; không khớp thì dùng đường dẫn mặc định."""
+    vid, pid = _hex_id(vid), _hex_id(pid)
+    if vid is not None or pid is not None or serial_number:
+        for p in list_ports.comports():
+            if vid is not None and p.vid != vid:
+                continue
+            if pid is not None and p.pid != pid:
+                continue
+            if serial_number and p.serial_number != serial_number:
+                continue
+            return p.device
+    if default and os.path.exists(default):
+        return default
+    return None
+
+
+def _device_present(path):
+    """Kiểm tra thiết bị còn cắm (node /dev và entry sysfs trên Linux)."""
+    if not path:
+        return False
+    real = os.path.realpath(path)
+    if not os.path.exists(real):
+        return False
+    name = os.path.basename(real)
+    sysfs = "/sys/class/tty"
+    if os.path.isdir(sysfs) and name.startswith("tty") and not os.path.exists(os.path.join(sysfs, name)):
+        return False
+    return True
+
+
+class LinkSupervisor:
+    """Theo dõi cổng serial của GroundController và tự mở lại khi radio bị rút/cắm lại.
+
+    Thread nền poll sự có mặt của thiết bị; khi mất link thì đóng handle cũ và
+    thử mở lại với backoff luỹ thừa, sau đó báo cho controller để RX/TX chạy tiếp.
+    """
+
+    def __init__(self, controller, poll=0.5, backoff_min=0.25, backoff_max=2.0):
+        self.ctl = controller
+        self.poll = poll
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self._thread = None
+        self._running = False
+        self._wake = threading.Event()
+        self._device = None              # đường dẫn thật của cổng đang mở
+        self.lost_at = None
+        self.last_recovery = None        # giây, lần phục hồi gần nhất
+        self.recoveries = []
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._running = False
+        self._wake.set()
+        t = self._thread
+        if t and t.is_alive() and t is not threading.current_thread():
+            t.join(timeout)
+
+    def kick(self):
+        """Báo lỗi serial từ RX/TX để supervisor xử lý ngay, không chờ poll."""
+        self._wake.set()
+
+    # ------------- internals -------------
+    def _port_ok(self):
+        ser = self.ctl.ser
+        if not ser or not ser.is_open:
+            return False
+        if self.ctl._serial_error:
+            return False
+        if self._device is None:
+            self._device = ser.port
+        return _device_present(self._device)
+
+    def _drop(self):
+        if self.lost_at is None:
+            self.lost_at = time.monotonic()
+            print(f"⚠️ [LINK] Mất cổng serial {self._device or self.ctl.port}")
+        self.ctl._on_port_down()
+
+    def _try_open(self):
+        path = find_port(self.ctl.port, self.ctl.usb_vid, self.ctl.usb_pid, self.ctl.usb_serial)
+        if not path:
+            return False
+        try:
+            ser = serial.Serial(path, self.ctl.baudrate, timeout=0.2)
+            ser.reset_input_buffer()
+            ser.reset_output_buffer()
+        except Exception as e:
+            print(f"❌ [LINK] Mở {path} thất bại: {e}")
+            return False
+        if not self._running:
+            # stop() chạy trong lúc đang mở -> không giao handle mới cho controller
+            ser.close()
+            return False
+        self._device = path
+        self.ctl._on_port_up(ser)
+        return True
+
+    def _run(self):
+        delay = self.backoff_min
+        attempts = 0
+        while self._running:
+            if self._port_ok():
+                delay = self.backoff_min
+                attempts = 0
+                self._wake.wait(self.poll)
+                self._wake.clear()
+                continue
+
+            if self.ctl.ser is not None:
+                self._drop()
+
+            attempts += 1
+            if self._try_open():
+                if self.lost_at is not None:
+                    dt = time.monotonic() - self.lost_at
+                    self.last_recovery = dt
+                    self.recoveries.append(dt)
+                    print(f"✅ [LINK] Đã kết nối lại {self._device} sau {dt:.2f}s (lần thử {attempts})")
+                    self.lost_at = None
+                else:
+                    print(f"✅ [LINK] Đã kết nối {self._device} @ {self.ctl.baudrate}")
+                continue
+
+            self._wake.wait(delay)
+            self._wake.clear()
+            delay = min(self.backoff_max, delay * 2)
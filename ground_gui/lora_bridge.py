@@ -7,6 +7,8 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.oauth2 import id_token
 from google.auth.transport import requests as grequests
 from pathlib import Path 
+from roles import decide_role, email_domain
+from telemetry_store import TelemetryStore
 from typing import Optional
 from typing import Optional 
 
@@ -37,6 +39,7 @@ class LoraBridge(QObject):
             super().__init__()
             self.controller = None
             self._rx_thread = None
+            self.telemetry = TelemetryStore()
 
             self._authed = False
             self._role   = "viewer"
@@ -79,16 +82,19 @@ class LoraBridge(QObject):
     # ---------- Telemetry passthrough ----------
     @pyqtSlot(float, float, float)
     def update_position(self, x, y, z):
+        self.telemetry.position(x, y, z)
         self.positionUpdated.emit(x, y, z)
         self.positionUpdatedLocal.emit(x, y, z)
 
     @pyqtSlot(float, float, float)
     def update_local_position(self, x, y, z):
+        self.telemetry.position(x, y, z)
         self.positionUpdatedLocal.emit(x, y, z)
         self.positionUpdated.emit(x, y, z)
 
     @pyqtSlot(float, float, float)
     def update_global_position(self, lat, lon, alt):
+        self.telemetry.gps(lat, lon, alt)
         self.positionUpdatedGPS.emit(lat, lon, alt)
 
     # ---------- Link control ----------
@@ -145,22 +151,46 @@ class LoraBridge(QObject):
     # ---------- Other passthrough ----------
     @pyqtSlot(float, float)
     def update_battery(self, percent, voltage):
+        self.telemetry.battery(percent, voltage)
         self.batteryUpdated.emit(percent, voltage)
 
     @pyqtSlot(float)
     def update_speed(self, spd):
+        self.telemetry.speed(spd)
         self.speedUpdated.emit(spd)
 
     @pyqtSlot(bool)
     def update_link(self, ok: bool):
+        self.telemetry.link(ok)
         self.linkUpdated.emit(bool(ok))
 
     @pyqtSlot(bool, str, str)
     def mode_push(self, ok: bool, mode: str, msg: str):
+        self.telemetry.mode(ok, str(mode), str(msg))
         self.modePushed.emit(bool(ok), str(mode), str(msg))
 
     modePush = mode_push  # alias giữ nguyên
 
+    # ---------- Telemetry cache (JS hỏi khi reload/mở drawer) ----------
+    @pyqtSlot(result=str)
+    def telemetrySnapshot(self):
+        return json.dumps(self.telemetry.snapshot())
+
+    @pyqtSlot(str, float, int, result=str)
+    def telemetryQuery(self, metric, seconds, points):
+        return json.dumps(self.telemetry.query(metric, seconds, points))
+
+    # ---------- Rate control (JS -> controller) ----------
+    @pyqtSlot(bool)
+    def setTelemetryVisible(self, visible: bool):
+        if self.controller and hasattr(self.controller, "set_ui_visible"):
+            self.controller.set_ui_visible(bool(visible))
+
+    @pyqtSlot(str)
+    def setMissionPhase(self, phase: str):
+        if self.controller and hasattr(self.controller, "set_mission_phase"):
+            self.controller.set_mission_phase(str(phase))
+
     # ---------- Role helpers ----------
     @pyqtSlot(str)
     def set_frontend_dir(self, path: str):
@@ -208,7 +238,7 @@ class LoraBridge(QObject):
         self._roles["default_role"] = (raw.get("default_role") or "viewer").lower()
 
     def _email_domain(self, email: str) -> str:
-        return (email.split("@", 1)[1] if "@" in email else "").lower()
+        return email_domain(email)
 
     def _allowed_domains(self) -> set[str]:
         ads = set(self._roles.get("allowed_domains") or [])
@@ -217,24 +247,7 @@ class LoraBridge(QObject):
 
     # ---------------- Role decision ----------------
     def decide_role(self, email: str) -> str:
-        e = (email or "").lower()
-        dom = self._email_domain(e)
-
-        # 1) admin luôn ưu tiên
-        if e in self._roles["admin"]:
-            return "admin"
-
-        # 2) email operator cụ thể
-        if e in self._roles["operator"]:
-            return "operator"
-
-        # 3) mặc định theo domain (nếu có)
-        by_dom = self._roles["domain_defaults"].get(dom)
-        if by_dom in {"admin", "operator", "viewer"}:
-            return by_dom  # ví dụ gmail.com -> operator
-
-        # 4) mặc định chung
-        return self._roles.get("default_role", "viewer")
+        return decide_role(self._roles, email)
 
     # ---------------- Google OAuth ----------------
     def _emit_auth_failed(self, msg: str):
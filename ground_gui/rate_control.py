@@ -0,0 +1,121 @@
+import time
+
+# Các stream telemetry drone phát ra; rate tính bằng Hz
+STREAMS = ("pos", "gps", "bat", "spd", "hb")
+
+# Ước lượng kích thước 1 frame JSON của từng stream (byte, kể cả '\n')
+FRAME_BYTES = {"pos": 48, "gps": 64, "bat": 44, "spd": 20, "hb": 12}
+
+# Giới hạn (min, max) Hz cho từng stream
+RATE_LIMITS = {
+    "pos": (0.5, 5.0),
+    "gps": (0.2, 2.0),
+    "bat": (0.1, 1.0),
+    "spd": (0.2, 2.0),
+    "hb":  (0.5, 1.0),
+}
+
+# Mức ưu tiên theo pha nhiệm vụ: 0 -> chỉ giữ rate min, 1 -> muốn rate max
+PHASE_WEIGHTS = {
+    "idle":    {"pos": 0.2, "gps": 0.2, "bat": 0.5, "spd": 0.1, "hb": 1.0},
+    "mission": {"pos": 1.0, "gps": 0.8, "bat": 0.4, "spd": 0.6, "hb": 1.0},
+    "landing": {"pos": 1.0, "gps": 0.5, "bat": 0.8, "spd": 0.8, "hb": 1.0},
+}
+
+# Stream chỉ hiển thị trong teleDrawer -> hạ về min khi drawer đóng
+DRAWER_STREAMS = ("bat", "spd")
+
+
+def _clamp(v, lo, hi):
+    return lo if v < lo else hi if v > hi else v
+
+
+class RateController:
+    """Tính rate từng stream telemetry sao cho không vượt quá airtime của link.
+
+    Ngân sách byte/s = baud/10 (8N1) * target_util * scale; scale chạy AIMD:
+    giảm nhân khi link bão hoà hoặc ACK chậm, tăng cộng khi link rảnh.
+    """
+
+    def __init__(self, baudrate=9600, target_util=0.6, ack_slow=1.5,
+                 min_change=0.2, resend_every=30.0, landed_alt=0.3, landing_timeout=120.0):
+        self.capacity = baudrate / 10.0         # byte/s, 8N1
+        self.target_util = target_util
+        self.ack_slow = ack_slow                 # giây; ACK chậm hơn -> co ngân sách
+        self.min_change = min_change             # chênh lệch tương đối tối thiểu để gửi lại
+        self.resend_every = resend_every
+        self.landed_alt = landed_alt             # m; |z| nhỏ hơn -> coi như đã chạm đất
+        self.landing_timeout = landing_timeout   # giây; hết hạn pha landing nếu không thấy chạm đất
+        self.scale = 1.0
+        self.frame_scale = 1.0                   # hệ số kích thước frame (FEC ~2.1)
+        self.phase = "idle"
+        self._phase_at = 0.0
+        self.ui_visible = False
+        self.rates = {}                          # rate đã gửi gần nhất
+        self._sent_at = 0.0
+
+    def set_phase(self, phase: str):
+        phase = (phase or "").lower()
+        if phase in PHASE_WEIGHTS:
+            self.phase = phase
+            self._phase_at = time.monotonic()
+
+    def set_ui_visible(self, visible: bool):
+        self.ui_visible = bool(visible)
+
+    def budget(self) -> float:
+        return self.capacity * self.target_util * self.scale
+
+    def cost(self, rates) -> float:
+        return sum(rates[s] * FRAME_BYTES[s] for s in rates) * self.frame_scale
+
+    def desired(self):
+        weights = PHASE_WEIGHTS[self.phase]
+        out = {}
+        for s in STREAMS:
+            lo, hi = RATE_LIMITS[s]
+            w = weights[s]
+            if s in DRAWER_STREAMS and not self.ui_visible:
+                w = 0.0
+            out[s] = lo + w * (hi - lo)
+        return out
+
+    def update(self, rx_bytes_per_s: float, ack_latency=None):
+        """Cập nhật scale theo số đo link, trả về rate đề xuất cho từng stream.
+
+        ack_latency là RTT của ACK mới nhận kể từ lần update trước (None nếu không có).
+        """
+        if self.phase == "landing" and time.monotonic() - self._phase_at > self.landing_timeout:
+            self.phase = "idle"
+        util = rx_bytes_per_s / self.capacity if self.capacity else 0.0
+        slow = ack_latency is not None and ack_latency > self.ack_slow
+        if util > self.target_util or slow:
+            self.scale = max(0.1, self.scale * 0.7)
+        else:
+            self.scale = min(1.0, self.scale + 0.05)
+
+        want = self.desired()
+        floor = {s: RATE_LIMITS[s][0] for s in STREAMS}
+        floor_cost = self.cost(floor)
+        want_cost = self.cost(want)
+        spare = self.budget() - floor_cost
+        if want_cost <= floor_cost:
+            k = 1.0
+        else:
+            k = _clamp(spare / (want_cost - floor_cost), 0.0, 1.0)
+
+        return {s: round(floor[s] + k * (want[s] - floor[s]), 1) for s in STREAMS}
+
+    def should_send(self, rates, now=None) -> bool:
+        now = time.monotonic() if now is None else now
+        if not self.rates or now - self._sent_at >= self.resend_every:
+            return True
+        for s, r in rates.items():
+            old = self.rates.get(s, 0.0)
+            if abs(r - old) > self.min_change * max(old, 0.1):
+                return True
+        return False
+
+    def mark_sent(self, rates, now=None):
+        self.rates = dict(rates)
+        self._sent_at = time.monotonic() if now is None else now
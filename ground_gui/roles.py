@@ -0,0 +1,25 @@
+# Quyết định role từ email, tách khỏi LoraBridge để dùng/đo được không cần Qt
+
+def email_domain(email: str) -> str:
+    return (email.split("@", 1)[1] if "@" in email else "").lower()
+
+
+def decide_role(roles: dict, email: str) -> str:
+    e = (email or "").lower()
+    dom = email_domain(e)
+
+    # 1) admin luôn ưu tiên
+    if e in roles["admin"]:
+        return "admin"
+
+    # 2) email operator cụ thể
+    if e in roles["operator"]:
+        return "operator"
+
+    # 3) mặc định theo domain (nếu có)
+    by_dom = roles["domain_defaults"].get(dom)
+    if by_dom in {"admin", "operator", "viewer"}:
+        return by_dom  # ví dụ gmail.com -> operator
+
+    # 4) mặc định chung
+    return roles.get("default_role", "viewer")
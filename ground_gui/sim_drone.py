@@ -0,0 +1,249 @@
+"""Drone giả lập qua pty để test GroundController không cần radio thật.
+
+Mô hình link: UART/LoRa 9600 baud 8N1 -> ~960 byte/s airtime. Frame được
+xếp hàng đợi phát; hàng đợi đầy thì frame cũ nhất bị bỏ (tính là drop).
+
+    python3 sim_drone.py --link /tmp/lora_ground
+    python3 control.py /tmp/lora_ground
+
+--fec bật mã Hamming/CRC (ground chạy với LORA_FEC=1), --ber thêm lỗi bit
+ngẫu nhiên trên cả hai chiều; lệnh trùng (sid, cmd, seq) không chạy lại mà
+chỉ phát lại ACK của lần thực thi đầu.
+
+--replug N giả lập rút radio mỗi N giây: đóng pty, xoá symlink, chờ --down
+giây rồi tạo pty mới (như USB cắm lại) để đo thời gian phục hồi.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import tty
+from collections import deque
+
+from fec import FEC_MARK, SeqFilter, decode as fec_decode, encode_line as fec_encode_line, flip_bits, seq_key
+from rate_control import STREAMS
+
+DEFAULT_RATES = {"pos": 5.0, "gps": 2.0, "bat": 1.0, "spd": 2.0, "hb": 1.0}
+
+
+class LinkModel:
+    def __init__(self, baudrate=9600, max_queue=8):
+        self.byte_time = 10.0 / baudrate        # giây/byte, 8N1
+        self.queue = deque()
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.busy = 0.0
+        self.offered = {s: 0 for s in STREAMS}
+        self.sent = {s: 0 for s in STREAMS}
+        self.dropped = 0
+        self.age_sum = 0.0
+        self.t0 = time.monotonic()
+
+    def push(self, stream, frame: bytes):
+        with self.lock:
+            self.offered[stream] += 1
+            if len(self.queue) >= self.max_queue:
+                self.queue.popleft()
+                self.dropped += 1
+            self.queue.append((stream, frame, time.monotonic()))
+
+    def pop(self):
+        with self.lock:
+            return self.queue.popleft() if self.queue else None
+
+    def report(self):
+        dt = max(time.monotonic() - self.t0, 1e-3)
+        n = sum(self.sent.values())
+        rates = " ".join(f"{s}={self.sent[s] / dt:.1f}" for s in STREAMS)
+        print(f"[SIM] util={self.busy / dt:.0%} delivered/s: {rates} "
+              f"drop={self.dropped} age={self.age_sum / max(n, 1) * 1000:.0f}ms")
+        self.reset_stats()
+
+
+class SimDrone:
+    def __init__(self, fd, link: LinkModel, slave=None, fec=False, ber=0.0):
+        self.fd = fd
+        self.slave = slave
+        self.fec = fec
+        self.ber = ber
+        self.seen_cmds = SeqFilter()
+        self.executed = 0
+        self.link = link
+        self.rates = dict(DEFAULT_RATES)
+        self.streaming = False
+        self.running = True
+
+    def frame(self, stream):
+        t = time.monotonic()
+        if stream == "pos":
+            d = {"x": round(10 * math.cos(t / 10), 3), "y": round(10 * math.sin(t / 10), 3), "z": 3.5}
+        elif stream == "gps":
+            d = {"lat": round(11.052939 + 1e-4 * math.sin(t / 10), 7),
+                 "lon": round(106.666123 + 1e-4 * math.cos(t / 10), 7), "alt": 3.5}
+        elif stream == "bat":
+            d = {"battery": {"percent": 0.87, "voltage": round(15.8 - random.random() * 0.1, 2)}}
+        elif stream == "spd":
+            d = {"speed": round(1.0 + random.random() * 0.2, 2)}
+        else:
+            d = {"hb": 1}
+        return self.wrap(json.dumps(d, separators=(",", ":")))
+
+    def wrap(self, text):
+        line = (text + "\n").encode("utf-8")
+        return fec_encode_line(line) if self.fec else line
+
+    def _gen_loop(self):
+        next_at = {s: 0.0 for s in STREAMS}
+        while self.running:
+            now = time.monotonic()
+            if self.streaming:
+                for s in STREAMS:
+                    r = self.rates.get(s, 0.0)
+                    if r > 0 and now >= next_at[s]:
+                        self.link.push(s, self.frame(s))
+                        next_at[s] = now + 1.0 / r
+            time.sleep(0.01)
+
+    def _tx_loop(self):
+        while self.running:
+            item = self.link.pop()
+            if not item:
+                time.sleep(0.005)
+                continue
+            stream, frame, queued_at = item
+            airtime = len(frame) * self.link.byte_time
+            time.sleep(airtime)
+            try:
+                os.write(self.fd, flip_bits(frame, self.ber))
+            except OSError:
+                continue             # đang "rút" radio -> frame mất
+            self.link.busy += airtime
+            self.link.sent[stream] += 1
+            self.link.age_sum += time.monotonic() - queued_at
+
+    def _handle(self, line: str):
+        if line == "ON":
+            self.streaming = True
+            return
+        if line == "OFF":
+            self.streaming = False
+            return
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            print(f"[SIM] bỏ qua: {line}")
+            return
+        cmd = data.get("cmd")
+        if cmd == "rate":
+            for s in STREAMS:
+                if s in data:
+                    self.rates[s] = max(0.0, float(data[s]))
+            print(f"[SIM] rate <- {self.rates}")
+        elif cmd in ("offboard", "land"):
+            seq = data.get("seq")
+            key = seq_key(data, cmd)
+            if key is not None and self.seen_cmds.seen(key):
+                print(f"[SIM] lệnh trùng {cmd} seq={seq} -> phát lại ACK cũ")
+                ack = self.seen_cmds.result(key)
+                if ack is None:
+                    return
+            else:
+                self.executed += 1
+                print(f"[SIM] thực thi {cmd} seq={seq} (tổng {self.executed})")
+                ack = {"event": "mode_push", "status": True, "mode": cmd.upper(), "msg": "sim",
+                       "sid": data.get("sid"), "seq": seq}
+                if key is not None:
+                    self.seen_cmds.remember(key, ack)
+            self.link.push("hb", self.wrap(json.dumps(ack)))
+        elif "waypoints" in data:
+            print(f"[SIM] nhận {len(data['waypoints'])} waypoint")
+
+    def _rx_loop(self):
+        buf = b""
+        while self.running:
+            try:
+                chunk = os.read(self.fd, 256)
+            except OSError:
+                buf = b""
+                time.sleep(0.05)
+                continue
+            buf += flip_bits(chunk, self.ber)
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                if line[:1] == FEC_MARK:
+                    line = fec_decode(line[1:])
+                    if line is None:
+                        print("[SIM] FEC không sửa được lệnh")
+                        continue
+                line = line.strip()
+                if line:
+                    self._handle(line.decode("utf-8", errors="replace"))
+
+    def run(self, report_every=5.0, replug=None):
+        for fn in (self._gen_loop, self._tx_loop, self._rx_loop):
+            threading.Thread(target=fn, daemon=True).start()
+        next_report = time.monotonic() + report_every
+        next_replug = time.monotonic() + replug[0] if replug else None
+        try:
+            while True:
+                time.sleep(0.1)
+                now = time.monotonic()
+                if now >= next_report:
+                    self.link.report()
+                    next_report = now + report_every
+                if next_replug and now >= next_replug:
+                    self.replug(*replug[1:])
+                    next_replug = time.monotonic() + replug[0]
+        except KeyboardInterrupt:
+            self.running = False
+
+    def replug(self, down, link_path):
+        print(f"[SIM] rút radio {down:.1f}s")
+        if link_path and os.path.islink(link_path):
+            os.unlink(link_path)
+        old = (self.fd, self.slave)
+        for fd in old:
+            try: os.close(fd)
+            except OSError: pass
+        time.sleep(down)
+        self.fd, self.slave, name = open_pty(link_path)
+        print(f"[SIM] cắm lại radio: {name} -> {link_path}")
+
+
+def open_pty(link_path=None):
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    name = os.ttyname(slave)
+    if link_path:
+        if os.path.islink(link_path):
+            os.unlink(link_path)
+        os.symlink(name, link_path)
+    return master, slave, name
+
+
+def main():
+    ap = argparse.ArgumentParser(description="LoRa drone simulator (pty)")
+    ap.add_argument("--link", default="/tmp/lora_ground", help="symlink trỏ tới pty")
+    ap.add_argument("--baud", type=int, default=9600)
+    ap.add_argument("--queue", type=int, default=8)
+    ap.add_argument("--fec", action="store_true", help="mã FEC cho frame (ground: LORA_FEC=1)")
+    ap.add_argument("--ber", type=float, default=0.0, help="tỉ lệ lỗi bit trên link")
+    ap.add_argument("--replug", type=float, default=0, help="giả lập rút/cắm radio mỗi N giây")
+    ap.add_argument("--down", type=float, default=2.0, help="thời gian radio bị rút (giây)")
+    args = ap.parse_args()
+
+    master, slave, name = open_pty(args.link)
+    print(f"[SIM] pty {name} -> {args.link} @ {args.baud}")
+    replug = (args.replug, args.down, args.link) if args.replug > 0 else None
+    drone = SimDrone(master, LinkModel(args.baud, args.queue), slave, fec=args.fec, ber=args.ber)
+    drone.run(replug=replug)
+
+
+if __name__ == "__main__":
+    main()
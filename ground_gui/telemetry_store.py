@@ -0,0 +1,148 @@
+import math
+import threading
+import time
+from array import array
+
+# Metric lưu chuỗi thời gian (ring buffer) cho sparkline trên map.html
+METRICS = ("battery", "voltage", "speed", "alt", "alt_gps")
+
+
+class MetricRing:
+    """Ring buffer kích thước cố định, lưu (t, v) trong 2 array('d')."""
+
+    def __init__(self, capacity=3600):
+        self.capacity = capacity
+        self.t = array("d", bytes(8 * capacity))
+        self.v = array("d", bytes(8 * capacity))
+        self.head = 0                 # vị trí ghi tiếp theo
+        self.count = 0
+
+    def append(self, t, v):
+        self.t[self.head] = t
+        self.v[self.head] = v
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def since(self, t0):
+        """Trả (ts, vs) có t >= t0, theo thứ tự thời gian."""
+        ts, vs = [], []
+        i = self.head
+        for _ in range(self.count):
+            i = (i - 1) % self.capacity
+            if self.t[i] < t0:
+                break
+            ts.append(self.t[i])
+            vs.append(self.v[i])
+        ts.reverse(); vs.reverse()
+        return ts, vs
+
+
+def downsample_minmax(ts, vs, t0, t1, points):
+    """Chia [t0, t1] thành points/2 bucket; mỗi bucket giữ điểm min và max
+    (theo đúng thứ tự thời gian) để sparkline không mất đỉnh/đáy."""
+    if len(ts) <= points:
+        return list(zip(ts, vs))
+    buckets = max(1, points // 2)
+    width = (t1 - t0) / buckets or 1.0
+    out = []
+    lo = hi = None
+    cur = -1
+    for t, v in zip(ts, vs):
+        b = min(buckets - 1, int((t - t0) / width))
+        if b != cur:
+            if lo is not None:
+                out.extend((lo, hi) if lo[0] <= hi[0] else (hi, lo))
+                if lo is hi:
+                    out.pop()
+            cur = b
+            lo = hi = (t, v)
+            continue
+        if v < lo[1]: lo = (t, v)
+        if v > hi[1]: hi = (t, v)
+    if lo is not None:
+        out.extend((lo, hi) if lo[0] <= hi[0] else (hi, lo))
+        if lo is hi:
+            out.pop()
+    return out
+
+
+class TelemetryStore:
+    """Snapshot trạng thái mới nhất + ring buffer theo metric cho LoraBridge."""
+
+    def __init__(self, capacity=3600):
+        self._lock = threading.Lock()
+        self._rings = {m: MetricRing(capacity) for m in METRICS}
+        self._snap = {}
+
+    def _put(self, key, value, now):
+        self._snap[key] = value
+        self._snap[key + "_t"] = now
+
+    def _add(self, metric, v, now):
+        if v is not None and math.isfinite(v):
+            self._rings[metric].append(now, v)
+
+    # ---- ghi (từ thread RX) ----
+    def position(self, x, y, z):
+        now = time.monotonic()
+        with self._lock:
+            self._put("local", {"x": x, "y": y, "z": z}, now)
+            self._add("alt", z, now)
+
+    def gps(self, lat, lon, alt):
+        now = time.monotonic()
+        with self._lock:
+            self._put("gps", {"lat": lat, "lon": lon, "alt": alt}, now)
+            self._add("alt_gps", alt, now)
+
+    def battery(self, percent, voltage):
+        now = time.monotonic()
+        p = percent if percent is not None and percent >= 0 else None
+        v = voltage if voltage is not None and math.isfinite(voltage) else None
+        with self._lock:
+            prev = self._snap.get("battery") or {}
+            self._put("battery", {"percent": p if p is not None else prev.get("percent"),
+                                  "voltage": v if v is not None else prev.get("voltage")}, now)
+            self._add("battery", p, now)
+            self._add("voltage", v, now)
+
+    def speed(self, spd):
+        now = time.monotonic()
+        with self._lock:
+            self._put("speed", spd, now)
+            self._add("speed", spd, now)
+
+    def link(self, ok):
+        with self._lock:
+            self._put("link", bool(ok), time.monotonic())
+
+    def mode(self, ok, mode, msg):
+        with self._lock:
+            self._put("mode", {"ok": bool(ok), "mode": mode, "msg": msg}, time.monotonic())
+
+    # ---- đọc (từ GUI) ----
+    def snapshot(self):
+        """Giá trị mới nhất của từng mục; *_age là số giây kể từ lần cập nhật."""
+        now = time.monotonic()
+        with self._lock:
+            out = {}
+            for k, v in self._snap.items():
+                if k.endswith("_t"):
+                    out[k[:-2] + "_age"] = round(now - v, 3)
+                else:
+                    out[k] = v
+        return out
+
+    def query(self, metric, seconds, points):
+        """N giây gần nhất của metric, downsample min/max còn <= points điểm.
+        Trả list [t, v] với t = giây tương đối so với hiện tại (<= 0)."""
+        ring = self._rings.get(metric)
+        if ring is None:
+            return []
+        now = time.monotonic()
+        t0 = now - max(0.0, float(seconds))
+        with self._lock:
+            ts, vs = ring.since(t0)
+        pts = downsample_minmax(ts, vs, t0, now, max(2, int(points)))
+        return [[round(t - now, 3), v] for t, v in pts]